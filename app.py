@@ -5,17 +5,33 @@ Main Flask application with API endpoints
 """
 
 import os
+import cProfile
+import csv
+import hashlib
+import hmac
+import io
 import json
+import marshal
+import pstats
+import queue
+import random
 import subprocess
 import shutil
+import sys
+import threading
 import time
 import uuid
-from datetime import datetime
+import zlib
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from flask import (Flask, Response, g, has_request_context, request, jsonify, render_template,
+                   send_from_directory, stream_with_context)
 from flask_cors import CORS
 import psutil
 import sqlite3
+import requests
 from werkzeug.utils import secure_filename
 import magic
 
@@ -25,6 +41,77 @@ MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB
 QUARANTINE_ENABLED = True
 LOG_LEVEL = 'INFO'
 
+# Cluster configuration (standalone, coordinator or worker)
+NODE_ROLE = os.environ.get('CLAMAV_NODE_ROLE', 'standalone').lower()
+WORKER_NODES = [node.strip().rstrip('/') for node in os.environ.get('CLAMAV_WORKER_NODES', '').split(',') if node.strip()]
+COORDINATOR_URL = os.environ.get('CLAMAV_COORDINATOR_URL', '').rstrip('/')
+CLUSTER_TOKEN = os.environ.get('CLAMAV_CLUSTER_TOKEN', '')
+HEARTBEAT_INTERVAL = int(os.environ.get('HEARTBEAT_INTERVAL', 5))  # seconds
+LEASE_TIMEOUT = int(os.environ.get('LEASE_TIMEOUT', 30))  # seconds
+WORK_UNIT_MAX_FILES = int(os.environ.get('WORK_UNIT_MAX_FILES', 100))
+WORK_UNIT_MAX_BYTES = int(os.environ.get('WORK_UNIT_MAX_BYTES', 1024 * 1024 * 1024))  # 1GB
+WORKER_SCAN_TIMEOUT = int(os.environ.get('WORKER_SCAN_TIMEOUT', 1800))  # seconds per work unit
+WORKER_MAX_UNITS = int(os.environ.get('WORKER_MAX_UNITS', 2))
+DISPATCH_TIMEOUT = 10  # seconds
+DISTRIBUTED_SCAN_TIMEOUT = int(os.environ.get('DISTRIBUTED_SCAN_TIMEOUT', 6 * 3600))  # 6 hours
+RETRY_ATTEMPTS = int(os.environ.get('RETRY_ATTEMPTS', 3))
+RETRY_DELAY = int(os.environ.get('RETRY_DELAY', 1))  # seconds
+
+# Dashboard event stream configuration
+METRICS_COLLECTION_INTERVAL = int(os.environ.get('METRICS_COLLECTION_INTERVAL', 5))  # seconds
+EVENT_KEEPALIVE_INTERVAL = 15  # seconds
+EVENT_QUEUE_SIZE = 100  # events buffered per client before it is dropped
+EVENT_REPLAY_SIZE = 200  # recent events kept for Last-Event-ID resumption
+
+# Chunked upload configuration
+UPLOAD_SESSION_PATH = os.environ.get('UPLOAD_SESSION_PATH', '/tmp/uploads/sessions')
+CHUNKED_UPLOAD_CHUNK_SIZE = int(os.environ.get('CHUNKED_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))  # 8MB
+CLAMAV_MAX_SCAN_SIZE = 2 * 1024 * 1024 * 1024 - 1  # ClamAV cannot scan files of 2GB or more
+CHUNKED_UPLOAD_MAX_SIZE = min(int(os.environ.get('CHUNKED_UPLOAD_MAX_SIZE', CLAMAV_MAX_SCAN_SIZE)),
+                              CLAMAV_MAX_SCAN_SIZE)
+UPLOAD_SESSION_TTL = int(os.environ.get('UPLOAD_SESSION_TTL', 3600))  # idle seconds before expiry
+UPLOAD_SESSION_SWEEP_INTERVAL = 60  # seconds
+PROGRESSIVE_SCAN_BYTES = int(os.environ.get('PROGRESSIVE_SCAN_BYTES', 64 * 1024 * 1024))  # 64MB
+PROGRESSIVE_SCAN_OVERLAP = 1024 * 1024  # 1MB re-scanned across window boundaries
+UPLOAD_READ_SIZE = 64 * 1024
+UPLOAD_SCAN_SECONDS_PER_MB = 1  # added to SCAN_TIMEOUT for the full-file scan of an upload
+
+# Profiling configuration
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'False').lower() == 'true'
+PERFORMANCE_MONITORING_ENABLED = os.environ.get('PERFORMANCE_MONITORING_ENABLED', 'False').lower() == 'true'
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0.01))  # fraction of requests under cProfile
+SLOW_REQUEST_THRESHOLD_MS = int(os.environ.get('SLOW_REQUEST_THRESHOLD_MS', 1000))
+PROFILE_STORE_SIZE = int(os.environ.get('PROFILE_STORE_SIZE', 100))
+PROFILED_PATH_PREFIXES = ('/api/scan/', '/api/history', '/api/quarantine', '/api/upload/')
+STACK_SAMPLE_INTERVAL = 0.05  # seconds between stack samples of a slow request
+MAX_SPANS_PER_REQUEST = 500
+MAX_STACKS_PER_REQUEST = 200
+ADMIN_TOKEN = os.environ.get('CLAMAV_ADMIN_TOKEN', '')
+
+# Retention and maintenance configuration
+AUDIT_RETENTION_DAYS = int(os.environ.get('AUDIT_RETENTION_DAYS', 90))  # scan_history detail rows
+METRICS_RETENTION_HOURS = int(os.environ.get('METRICS_RETENTION_HOURS', 24))  # hourly rollups
+QUARANTINE_RETENTION_DAYS = int(os.environ.get('QUARANTINE_RETENTION_DAYS', 30))
+QUARANTINE_AUTO_CLEANUP = os.environ.get('QUARANTINE_AUTO_CLEANUP', 'True').lower() == 'true'
+ROLLUP_INTERVAL = int(os.environ.get('ROLLUP_INTERVAL', 300))  # seconds
+MAINTENANCE_INTERVAL = int(os.environ.get('MAINTENANCE_INTERVAL', 3600))  # seconds between prune passes
+PRUNE_BATCH_SIZE = 500  # rows deleted per transaction
+PRUNE_BATCH_PAUSE = 0.05  # seconds between batches so scans can write
+VACUUM_PAGES = 1000  # pages released per incremental_vacuum step
+
+# Scan coalescing configuration
+SCAN_RESULT_REUSE_SECONDS = int(os.environ.get('SCAN_RESULT_REUSE_SECONDS', 30))  # 0 disables reuse
+SIGNATURE_VERSION_TTL = 60  # seconds between clamscan --version checks
+
+# Export configuration
+EXPORT_BATCH_SIZE = 500  # rows fetched from SQLite per round trip
+EXPORT_TABLES = {
+    'history': ('scan_history', ['id', 'scan_type', 'path', 'status', 'infected_count', 'total_files',
+                                 'scan_duration', 'bytes_scanned', 'timestamp', 'details']),
+    'quarantine': ('quarantine', ['id', 'original_path', 'quarantine_path', 'virus_name', 'file_size',
+                                  'timestamp', 'status'])
+}
+
 # Initialize Flask app
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
@@ -39,14 +126,184 @@ LOGS_PATH = os.environ.get('CLAMAV_LOGS_PATH', '/opt/clamav-web/logs')
 os.makedirs(DB_PATH, exist_ok=True)
 os.makedirs(QUARANTINE_PATH, exist_ok=True)
 os.makedirs(LOGS_PATH, exist_ok=True)
+os.makedirs(UPLOAD_SESSION_PATH, exist_ok=True)
 
 DB_FILE = os.path.join(DB_PATH, 'clamav_web.db')
 
+# Request profiling
+profile_lock = threading.Lock()
+profile_store = deque(maxlen=PROFILE_STORE_SIZE)
+active_requests = {}
+profile_state = {'next_id': 1, 'sampler': None}
+
+@contextmanager
+def profile_span(name):
+    """Record a timing span (scanner, sqlite, quarantine_io) on the current monitored request"""
+    spans = g.get('profile_spans') if has_request_context() else None
+    if spans is None or len(spans) >= MAX_SPANS_PER_REQUEST:
+        yield
+        return
+    
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans.append({
+            'name': name,
+            'start_ms': (start - g.profile_start) * 1000,
+            'duration_ms': (time.perf_counter() - start) * 1000
+        })
+
+def fold_stack(frame):
+    """Render a frame chain as a folded stack string (outermost first)"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+def sample_slow_requests():
+    """Collect stack samples from requests running past the slow threshold
+    
+    Exits once no monitored request is in flight; the next request restarts it.
+    """
+    threshold = SLOW_REQUEST_THRESHOLD_MS / 1000
+    while True:
+        time.sleep(STACK_SAMPLE_INTERVAL)
+        now = time.perf_counter()
+        with profile_lock:
+            if not active_requests:
+                profile_state['sampler'] = None
+                return
+            slow = [(tid, req) for tid, req in active_requests.items() if now - req['start'] > threshold]
+        if not slow:
+            continue
+        
+        frames = sys._current_frames()
+        samples = [(req, fold_stack(frames[tid])) for tid, req in slow if tid in frames]
+        del frames
+        with profile_lock:
+            for req, stack in samples:
+                stacks = req['stacks']
+                if stack in stacks or len(stacks) < MAX_STACKS_PER_REQUEST:
+                    stacks[stack] = stacks.get(stack, 0) + 1
+
+def start_request_profile():
+    """Begin timing (and possibly cProfile) for a monitored request"""
+    if not request.path.startswith(PROFILED_PATH_PREFIXES):
+        return
+    
+    g.profile_start = time.perf_counter()
+    g.profile_spans = []
+    g.profile_status = 500
+    g.profiler = None
+    
+    if PROFILING_ENABLED and random.random() < PROFILING_SAMPLE_RATE:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            g.profiler = profiler
+        except ValueError:
+            pass  # Another profiler is already active on this thread
+    
+    with profile_lock:
+        active_requests[threading.get_ident()] = {'start': g.profile_start, 'stacks': {}}
+        if profile_state['sampler'] is None:
+            sampler = threading.Thread(target=sample_slow_requests, daemon=True)
+            profile_state['sampler'] = sampler
+            sampler.start()
+
+def finish_request_profile():
+    """Store the request profile if it was sampled or slow"""
+    if 'profile_start' not in g:
+        return
+    
+    profiler = g.profiler
+    if profiler is not None:
+        profiler.disable()
+    
+    duration_ms = (time.perf_counter() - g.profile_start) * 1000
+    with profile_lock:
+        sampled = active_requests.pop(threading.get_ident(), {'stacks': {}})
+        stack_counts = dict(sampled['stacks'])
+    
+    slow = duration_ms >= SLOW_REQUEST_THRESHOLD_MS
+    if not slow and profiler is None:
+        return
+    
+    span_totals = {}
+    for span in g.profile_spans:
+        span_totals[span['name']] = span_totals.get(span['name'], 0) + span['duration_ms']
+    
+    record = {
+        'method': request.method,
+        'path': request.path,
+        'status': g.profile_status,
+        'duration_ms': duration_ms,
+        'timestamp': datetime.now().isoformat(),
+        'slow': slow,
+        'sampled': profiler is not None,
+        'span_totals': span_totals,
+        'spans': g.profile_spans,
+        'stacks': sorted(({'stack': k, 'count': v} for k, v in stack_counts.items()),
+                         key=lambda item: item['count'], reverse=True),
+        'profile': None,
+        'pstats': None
+    }
+    
+    if profiler is not None:
+        output = io.StringIO()
+        stats = pstats.Stats(profiler, stream=output)
+        stats.sort_stats('cumulative').print_stats(30)
+        record['profile'] = output.getvalue()
+        profiler.create_stats()
+        record['pstats'] = marshal.dumps(profiler.stats)
+    
+    if slow:
+        app.logger.warning(f"Slow request: {request.method} {request.path} took {duration_ms:.0f}ms "
+                           f"({', '.join(f'{k}={v:.0f}ms' for k, v in span_totals.items()) or 'no spans'})")
+    
+    with profile_lock:
+        record['id'] = profile_state['next_id']
+        profile_state['next_id'] += 1
+        profile_store.append(record)
+
+def admin_authorized():
+    """Check the admin token on an incoming admin request; admin endpoints are off without one"""
+    if not ADMIN_TOKEN:
+        return False
+    return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN)
+
+if PROFILING_ENABLED or PERFORMANCE_MONITORING_ENABLED:
+    @app.before_request
+    def before_request_profile():
+        start_request_profile()
+    
+    @app.after_request
+    def after_request_profile(response):
+        if 'profile_start' in g:
+            g.profile_status = response.status_code
+        return response
+    
+    @app.teardown_request
+    def teardown_request_profile(exc):
+        finish_request_profile()
+
 def init_db():
     """Initialize SQLite database"""
     conn = sqlite3.connect(DB_FILE)
     cursor = conn.cursor()
     
+    # Incremental vacuum lets maintenance hand pruned pages back to the filesystem;
+    # an existing database needs one full VACUUM to switch modes
+    if cursor.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        cursor.execute('VACUUM')
+    
+    # WAL lets readers (exports, dashboards) run alongside scan writes
+    cursor.execute('PRAGMA journal_mode = WAL')
+    
     # Create scan history table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS scan_history (
@@ -58,10 +315,15 @@ def init_db():
             total_files INTEGER DEFAULT 0,
             scan_duration REAL DEFAULT 0,
             timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            details TEXT
+            details TEXT,
+            bytes_scanned INTEGER DEFAULT 0
         )
     ''')
     
+    columns = [row[1] for row in cursor.execute('PRAGMA table_info(scan_history)')]
+    if 'bytes_scanned' not in columns:
+        cursor.execute('ALTER TABLE scan_history ADD COLUMN bytes_scanned INTEGER DEFAULT 0')
+    
     # Create quarantine table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS quarantine (
@@ -75,29 +337,89 @@ def init_db():
         )
     ''')
     
+    # Create rollup tables (hourly and daily aggregates per scan type)
+    for table in ('scan_rollup_hourly', 'scan_rollup_daily'):
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                bucket TEXT NOT NULL,
+                scan_type TEXT NOT NULL,
+                scans INTEGER DEFAULT 0,
+                failed INTEGER DEFAULT 0,
+                infections INTEGER DEFAULT 0,
+                bytes_scanned INTEGER DEFAULT 0,
+                total_duration REAL DEFAULT 0,
+                max_duration REAL DEFAULT 0,
+                PRIMARY KEY (bucket, scan_type)
+            )
+        ''')
+    
+    # Maintenance bookkeeping (rollup watermark)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS maintenance_state (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+    
+    # Indexes for history listing and date-range exports
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_scan_history_timestamp ON scan_history(timestamp)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_quarantine_timestamp ON quarantine(timestamp)')
+    
     conn.commit()
     conn.close()
 
-def log_scan(scan_type, path, status, infected_count=0, total_files=0, scan_duration=0, details=None):
+@profile_span('sqlite')
+def log_scan(scan_type, path, status, infected_count=0, total_files=0, scan_duration=0, details=None,
+             bytes_scanned=0):
     """Log scan results to database"""
     conn = sqlite3.connect(DB_FILE)
     cursor = conn.cursor()
     
     cursor.execute('''
-        INSERT INTO scan_history (scan_type, path, status, infected_count, total_files, scan_duration, details)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (scan_type, path, status, infected_count, total_files, scan_duration, details))
+        INSERT INTO scan_history (scan_type, path, status, infected_count, total_files, scan_duration, details,
+                                  bytes_scanned)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (scan_type, path, status, infected_count, total_files, scan_duration, details, bytes_scanned))
+    scan_id = cursor.lastrowid
+    
+    cursor.execute('SELECT timestamp FROM scan_history WHERE id = ?', (scan_id,))
+    timestamp = cursor.fetchone()[0]
     
     conn.commit()
     conn.close()
+    
+    record = {
+        'id': scan_id,
+        'scan_type': scan_type,
+        'path': path,
+        'status': status,
+        'infected_count': infected_count,
+        'total_files': total_files,
+        'scan_duration': scan_duration,
+        'bytes_scanned': bytes_scanned,
+        'timestamp': timestamp,
+        'details': details
+    }
+    publish_event('history', record)
+    publish_event('scan_complete', {
+        'id': scan_id,
+        'scan_type': scan_type,
+        'path': path,
+        'status': status,
+        'infected_count': infected_count
+    })
+    
+    return scan_id
 
+@profile_span('sqlite')
 def get_scan_history(limit=50):
     """Get scan history from database"""
     conn = sqlite3.connect(DB_FILE)
     cursor = conn.cursor()
     
     cursor.execute('''
-        SELECT id, scan_type, path, status, infected_count, total_files, scan_duration, timestamp, details
+        SELECT id, scan_type, path, status, infected_count, total_files, scan_duration, timestamp, details,
+               bytes_scanned
         FROM scan_history
         ORDER BY timestamp DESC
         LIMIT ?
@@ -116,7 +438,8 @@ def get_scan_history(limit=50):
             'total_files': row[5],
             'scan_duration': row[6],
             'timestamp': row[7],
-            'details': row[8]
+            'details': row[8],
+            'bytes_scanned': row[9]
         }
         for row in results
     ]
@@ -132,25 +455,45 @@ def quarantine_file(file_path, virus_name=None):
         quarantine_file_path = os.path.join(QUARANTINE_PATH, quarantine_filename)
         
         # Move file to quarantine
-        shutil.move(file_path, quarantine_file_path)
+        with profile_span('quarantine_io'):
+            shutil.move(file_path, quarantine_file_path)
         
         # Log to database
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
+        with profile_span('sqlite'):
+            conn = sqlite3.connect(DB_FILE)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT INTO quarantine (original_path, quarantine_path, virus_name, file_size)
+                VALUES (?, ?, ?, ?)
+            ''', (file_path, quarantine_file_path, virus_name, file_size))
+            quarantine_id = cursor.lastrowid
+            
+            cursor.execute('SELECT timestamp, status FROM quarantine WHERE id = ?', (quarantine_id,))
+            timestamp, status = cursor.fetchone()
+            
+            conn.commit()
+            conn.close()
         
-        cursor.execute('''
-            INSERT INTO quarantine (original_path, quarantine_path, virus_name, file_size)
-            VALUES (?, ?, ?, ?)
-        ''', (file_path, quarantine_file_path, virus_name, file_size))
-        
-        conn.commit()
-        conn.close()
+        publish_event('quarantine', {
+            'action': 'added',
+            'record': {
+                'id': quarantine_id,
+                'original_path': file_path,
+                'quarantine_path': quarantine_file_path,
+                'virus_name': virus_name,
+                'file_size': file_size,
+                'timestamp': timestamp,
+                'status': status
+            }
+        })
         
         return quarantine_file_path
     except Exception as e:
         app.logger.error(f"Failed to quarantine {file_path}: {e}")
         return None
 
+@profile_span('sqlite')
 def get_quarantine_list():
     """Get list of quarantined files"""
     conn = sqlite3.connect(DB_FILE)
@@ -178,8 +521,14 @@ def get_quarantine_list():
         for row in results
     ]
 
-def run_clamscan(path, recursive=True):
-    """Run ClamAV scan on specified path"""
+@profile_span('scanner')
+def run_clamscan(path, recursive=True, max_size=None, timeout=SCAN_TIMEOUT):
+    """Run ClamAV scan on specified path (or list of paths).
+    
+    max_size raises ClamAV's file/scan size limits (default 100MB/400MB) and
+    makes it report anything it had to skip instead of passing it as clean.
+    returncode is 2 when clamscan hit an error (e.g. an unreadable path).
+    """
     start_time = time.time()
     
     try:
@@ -187,21 +536,26 @@ def run_clamscan(path, recursive=True):
         cmd = ['clamscan', '--no-summary', '--infected']
         if recursive:
             cmd.append('--recursive')
-        cmd.append(path)
+        if max_size:
+            cmd.extend([f'--max-filesize={max_size}', f'--max-scansize={max_size}', '--alert-exceeds-max=yes'])
+        if isinstance(path, (list, tuple)):
+            cmd.extend(path)
+        else:
+            cmd.append(path)
         
         # Run scan with timeout
         result = subprocess.run(
             cmd,
             capture_output=True,
             text=True,
-            timeout=SCAN_TIMEOUT
+            timeout=timeout
         )
         
         scan_duration = time.time() - start_time
         
         # Parse results
         infected_files = []
-        if result.returncode == 1:  # Found viruses
+        if result.returncode in (1, 2):  # Found viruses (2 may still report some)
             for line in result.stdout.split('\n'):
                 if line.strip() and ': ' in line:
                     file_path, virus_name = line.rsplit(': ', 1)
@@ -216,6 +570,7 @@ def run_clamscan(path, recursive=True):
             'infected_count': len(infected_files),
             'infected_files': infected_files,
             'scan_duration': scan_duration,
+            'returncode': result.returncode,
             'output': result.stdout,
             'error': result.stderr
         }
@@ -224,7 +579,7 @@ def run_clamscan(path, recursive=True):
         return {
             'success': False,
             'error': 'Scan timeout exceeded',
-            'scan_duration': SCAN_TIMEOUT
+            'scan_duration': timeout
         }
     except Exception as e:
         return {
@@ -355,6 +710,1134 @@ def run_diagnostics():
     
     return diagnostics
 
+# Retention and rollups
+maintenance_lock = threading.Lock()
+maintenance_state = {'thread': None, 'last_prune': 0, 'last_run': None}
+
+ROLLUP_BUCKETS = {
+    'scan_rollup_hourly': "strftime('%Y-%m-%d %H:00:00', timestamp)",
+    'scan_rollup_daily': "date(timestamp)"
+}
+
+def get_maintenance_value(cursor, key, default=None):
+    """Read a maintenance bookkeeping value"""
+    row = cursor.execute('SELECT value FROM maintenance_state WHERE key = ?', (key,)).fetchone()
+    return row[0] if row else default
+
+def rollup_scan_history():
+    """Fold scan_history rows added since the last run into the hourly and daily rollups"""
+    conn = sqlite3.connect(DB_FILE, timeout=30)
+    try:
+        cursor = conn.cursor()
+        last_id = int(get_maintenance_value(cursor, 'rollup_last_id', 0))
+        max_id = cursor.execute('SELECT MAX(id) FROM scan_history').fetchone()[0] or 0
+        if max_id <= last_id:
+            return 0
+        
+        for table, bucket in ROLLUP_BUCKETS.items():
+            cursor.execute(f'''
+                INSERT INTO {table} (bucket, scan_type, scans, failed, infections, bytes_scanned,
+                                     total_duration, max_duration)
+                SELECT {bucket}, scan_type, COUNT(*), SUM(status = 'failed'), SUM(infected_count),
+                       SUM(bytes_scanned), SUM(scan_duration), MAX(scan_duration)
+                FROM scan_history
+                WHERE id > ? AND id <= ?
+                GROUP BY 1, 2
+                ON CONFLICT (bucket, scan_type) DO UPDATE SET
+                    scans = scans + excluded.scans,
+                    failed = failed + excluded.failed,
+                    infections = infections + excluded.infections,
+                    bytes_scanned = bytes_scanned + excluded.bytes_scanned,
+                    total_duration = total_duration + excluded.total_duration,
+                    max_duration = MAX(max_duration, excluded.max_duration)
+            ''', (last_id, max_id))
+        
+        cursor.execute('''
+            INSERT INTO maintenance_state (key, value) VALUES ('rollup_last_id', ?)
+            ON CONFLICT (key) DO UPDATE SET value = excluded.value
+        ''', (str(max_id),))
+        conn.commit()
+        return max_id - last_id
+    finally:
+        conn.close()
+
+def prune_in_batches(conn, table, where, params, columns='rowid', on_batch=None):
+    """Delete matching rows in small transactions so writers are never blocked for long"""
+    total = 0
+    while True:
+        cursor = conn.cursor()
+        rows = cursor.execute(f"SELECT {columns} FROM {table} WHERE {where} LIMIT {PRUNE_BATCH_SIZE}",
+                              params).fetchall()
+        if not rows:
+            return total
+        if on_batch:
+            on_batch(rows)
+        cursor.executemany(f'DELETE FROM {table} WHERE rowid = ?', [(row[0],) for row in rows])
+        conn.commit()
+        total += len(rows)
+        time.sleep(PRUNE_BATCH_PAUSE)
+
+def remove_expired_quarantine_files(rows):
+    """Delete quarantined files whose records are being pruned"""
+    for file_id, quarantine_path in rows:
+        with profile_span('quarantine_io'):
+            try:
+                if os.path.exists(quarantine_path):
+                    os.remove(quarantine_path)
+            except OSError as e:
+                app.logger.error(f"Failed to remove expired quarantine file {quarantine_path}: {e}")
+        publish_event('quarantine', {'action': 'removed', 'id': file_id})
+
+def prune_expired_records():
+    """Drop detail rows past retention, then release the freed pages"""
+    conn = sqlite3.connect(DB_FILE, timeout=30)
+    try:
+        cursor = conn.cursor()
+        rolled_up_id = int(get_maintenance_value(cursor, 'rollup_last_id', 0))
+        
+        # Only rows already folded into the rollups may go
+        pruned = {
+            'scan_history': prune_in_batches(
+                conn, 'scan_history', "timestamp < datetime('now', ?) AND id <= ?",
+                (f'-{AUDIT_RETENTION_DAYS} days', rolled_up_id)
+            ),
+            'scan_rollup_hourly': prune_in_batches(
+                conn, 'scan_rollup_hourly', "bucket < strftime('%Y-%m-%d %H:00:00', 'now', ?)",
+                (f'-{METRICS_RETENTION_HOURS} hours',)
+            ),
+            'quarantine': 0
+        }
+        if QUARANTINE_AUTO_CLEANUP:
+            pruned['quarantine'] = prune_in_batches(
+                conn, 'quarantine', "timestamp < datetime('now', ?)",
+                (f'-{QUARANTINE_RETENTION_DAYS} days',),
+                columns='id, quarantine_path', on_batch=remove_expired_quarantine_files
+            )
+        
+        # Release free pages a step at a time instead of one long VACUUM
+        freed = 0
+        free_pages = cursor.execute('PRAGMA freelist_count').fetchone()[0]
+        while free_pages:
+            cursor.execute(f'PRAGMA incremental_vacuum({VACUUM_PAGES})').fetchall()
+            remaining = cursor.execute('PRAGMA freelist_count').fetchone()[0]
+            if remaining >= free_pages:
+                break
+            freed += free_pages - remaining
+            free_pages = remaining
+            time.sleep(PRUNE_BATCH_PAUSE)
+        
+        pruned['pages_freed'] = freed
+        return pruned
+    finally:
+        conn.close()
+
+def run_maintenance(prune=True):
+    """One maintenance pass: rollups always, pruning and vacuum when requested"""
+    with maintenance_lock:
+        result = {'rolled_up': rollup_scan_history()}
+        if prune:
+            result['pruned'] = prune_expired_records()
+            maintenance_state['last_prune'] = time.time()
+        result['timestamp'] = datetime.now().isoformat()
+        maintenance_state['last_run'] = result
+        return result
+
+def maintenance_loop():
+    """Roll up every ROLLUP_INTERVAL and prune every MAINTENANCE_INTERVAL"""
+    while True:
+        try:
+            prune = time.time() - maintenance_state['last_prune'] >= MAINTENANCE_INTERVAL
+            result = run_maintenance(prune)
+            if prune:
+                app.logger.info(f"Maintenance completed: {result}")
+        except Exception as e:
+            app.logger.error(f"Maintenance failed: {e}")
+        time.sleep(ROLLUP_INTERVAL)
+
+def start_maintenance():
+    """Start the background maintenance thread"""
+    thread = maintenance_state['thread']
+    if thread is None or not thread.is_alive():
+        thread = threading.Thread(target=maintenance_loop, daemon=True)
+        maintenance_state['thread'] = thread
+        thread.start()
+
+@profile_span('sqlite')
+def get_dashboard_summary(days=7):
+    """Aggregate dashboard totals from the rollup tables only"""
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        SELECT scan_type, SUM(scans), SUM(failed), SUM(infections), SUM(bytes_scanned),
+               SUM(total_duration), MAX(max_duration)
+        FROM scan_rollup_daily
+        WHERE bucket >= date('now', ?)
+        GROUP BY scan_type
+    ''', (f'-{days - 1} days',))
+    by_type = {
+        row[0]: {
+            'scans': row[1],
+            'failed': row[2],
+            'infections': row[3],
+            'bytes_scanned': row[4],
+            'avg_duration': row[5] / row[1] if row[1] else 0,
+            'max_duration': row[6]
+        }
+        for row in cursor.fetchall()
+    }
+    
+    cursor.execute('''
+        SELECT bucket, SUM(scans), SUM(infections), SUM(bytes_scanned)
+        FROM scan_rollup_daily
+        WHERE bucket >= date('now', ?)
+        GROUP BY bucket
+        ORDER BY bucket
+    ''', (f'-{days - 1} days',))
+    daily = [
+        {'date': row[0], 'scans': row[1], 'infections': row[2], 'bytes_scanned': row[3]}
+        for row in cursor.fetchall()
+    ]
+    
+    cursor.execute('''
+        SELECT bucket, SUM(scans), SUM(infections)
+        FROM scan_rollup_hourly
+        WHERE bucket >= strftime('%Y-%m-%d %H:00:00', 'now', '-23 hours')
+        GROUP BY bucket
+        ORDER BY bucket
+    ''')
+    hourly = [{'hour': row[0], 'scans': row[1], 'infections': row[2]} for row in cursor.fetchall()]
+    
+    conn.close()
+    
+    return {
+        'days': days,
+        'totals': {
+            'scans': sum(t['scans'] for t in by_type.values()),
+            'infections': sum(t['infections'] for t in by_type.values()),
+            'bytes_scanned': sum(t['bytes_scanned'] for t in by_type.values())
+        },
+        'by_scan_type': by_type,
+        'daily': daily,
+        'hourly': hourly,
+        'rolled_up_through': maintenance_state['last_run']['timestamp'] if maintenance_state['last_run'] else None
+    }
+
+# Resumable chunked uploads
+upload_lock = threading.Lock()
+upload_sessions = {}
+upload_state = {'sweeper': None}
+
+def create_upload_session(filename, size, sha256=None):
+    """Register a resumable upload and allocate its spool file"""
+    session_id = str(uuid.uuid4())
+    path = os.path.join(UPLOAD_SESSION_PATH, f"{session_id}_{filename}")
+    open(path, 'wb').close()
+    
+    session = {
+        'id': session_id,
+        'filename': filename,
+        'path': path,
+        'size': size,
+        'expected_sha256': sha256,
+        'received': 0,
+        'hasher': hashlib.sha256(),
+        'chunks': {},
+        'status': 'uploading',
+        'scanned': 0,
+        'scan_thread': None,
+        'result': None,
+        'updated': time.time(),
+        'lock': threading.Lock()
+    }
+    
+    with upload_lock:
+        upload_sessions[session_id] = session
+        sweeper = upload_state['sweeper']
+        if sweeper is None or not sweeper.is_alive():
+            sweeper = threading.Thread(target=sweep_upload_sessions, daemon=True)
+            upload_state['sweeper'] = sweeper
+            sweeper.start()
+    
+    return session
+
+def get_upload_session_status(session):
+    """Summarise an upload session for the API"""
+    return {
+        'session_id': session['id'],
+        'filename': session['filename'],
+        'size': session['size'],
+        'offset': session['received'],
+        'chunk_size': CHUNKED_UPLOAD_CHUNK_SIZE,
+        'status': session['status'],
+        'scanned': session['scanned'],
+        'result': session['result'],
+        'expires': datetime.fromtimestamp(session['updated'] + UPLOAD_SESSION_TTL).isoformat()
+    }
+
+def discard_upload_session(session_id):
+    """Forget an upload session and remove its spool file"""
+    with upload_lock:
+        session = upload_sessions.pop(session_id, None)
+    if session and os.path.exists(session['path']):
+        os.remove(session['path'])
+
+def sweep_upload_sessions():
+    """Expire abandoned upload sessions; stops once none are left"""
+    while True:
+        time.sleep(UPLOAD_SESSION_SWEEP_INTERVAL)
+        now = time.time()
+        with upload_lock:
+            if not upload_sessions:
+                upload_state['sweeper'] = None
+                return
+            expired = [s['id'] for s in upload_sessions.values()
+                       if s['status'] != 'scanning' and now - s['updated'] > UPLOAD_SESSION_TTL]
+        
+        for session_id in expired:
+            app.logger.info(f"Expiring abandoned upload session {session_id}")
+            discard_upload_session(session_id)
+
+def remove_orphaned_upload_files():
+    """Delete spool and window files left behind by sessions lost in a restart"""
+    with upload_lock:
+        known = {os.path.basename(s['path']) for s in upload_sessions.values()}
+    
+    for name in os.listdir(UPLOAD_SESSION_PATH):
+        if name.removesuffix('.window') in known:
+            continue
+        path = os.path.join(UPLOAD_SESSION_PATH, name)
+        try:
+            if os.path.isfile(path):
+                os.remove(path)
+                app.logger.info(f"Removed orphaned upload file {name}")
+        except OSError as e:
+            app.logger.warning(f"Could not remove orphaned upload file {name}: {e}")
+
+def write_upload_chunk(session, offset, length, stream):
+    """Append a chunk at the given offset, hashing incrementally.
+    
+    Returns 'written' or 'duplicate'; raises ValueError if the offset is not the
+    current end of the upload or a previously received chunk boundary.
+    """
+    if offset < session['received']:
+        # Client retry of a chunk we already have: accept it only if it is identical
+        known = session['chunks'].get(offset)
+        digest = hashlib.sha256()
+        remaining = length
+        while remaining:
+            data = stream.read(min(UPLOAD_READ_SIZE, remaining))
+            if not data:
+                raise ValueError('Chunk body shorter than Content-Length')
+            digest.update(data)
+            remaining -= len(data)
+        if known != (length, digest.hexdigest()):
+            raise ValueError('Chunk conflicts with data already received')
+        return 'duplicate'
+    
+    if offset != session['received']:
+        raise ValueError('Chunk offset does not match upload offset')
+    
+    # Work on a copy so a dropped connection leaves the hash state untouched
+    hasher = session['hasher'].copy()
+    digest = hashlib.sha256()
+    remaining = length
+    try:
+        with open(session['path'], 'r+b') as f:
+            f.seek(offset)
+            while remaining:
+                data = stream.read(min(UPLOAD_READ_SIZE, remaining))
+                if not data:
+                    raise ValueError('Chunk body shorter than Content-Length')
+                f.write(data)
+                hasher.update(data)
+                digest.update(data)
+                remaining -= len(data)
+    except Exception:
+        with open(session['path'], 'r+b') as f:
+            f.truncate(session['received'])
+        raise
+    
+    session['hasher'] = hasher
+    session['chunks'][offset] = (length, digest.hexdigest())
+    session['received'] += length
+    return 'written'
+
+def split_limit_alerts(scan_result):
+    """Separate ClamAV 'limits exceeded' alerts from real detections.
+    
+    Data skipped because of a size/recursion limit was not scanned; it is
+    reported under limits_exceeded rather than as infected or clean.
+    """
+    if not scan_result.get('success'):
+        return scan_result
+    
+    infected, skipped = [], []
+    for item in scan_result.get('infected_files', []):
+        (skipped if item['virus'].startswith('Heuristics.Limits.Exceeded') else infected).append(item)
+    scan_result['infected_files'] = infected
+    scan_result['infected_count'] = len(infected)
+    scan_result['limits_exceeded'] = skipped
+    # Exit code 2 means clamscan hit an error and may not have read the whole file
+    scan_result['fully_scanned'] = not skipped and scan_result.get('returncode') != 2
+    return scan_result
+
+def start_progressive_scan(session):
+    """Scan newly received data in the background once enough has arrived (caller holds session lock)"""
+    thread = session['scan_thread']
+    if thread is not None and thread.is_alive():
+        return
+    if session['received'] - session['scanned'] < PROGRESSIVE_SCAN_BYTES:
+        return
+    
+    # Windows never exceed PROGRESSIVE_SCAN_BYTES + overlap, even when uploads outpace the scanner
+    start = max(0, session['scanned'] - PROGRESSIVE_SCAN_OVERLAP)
+    end = min(session['received'], start + PROGRESSIVE_SCAN_BYTES + PROGRESSIVE_SCAN_OVERLAP)
+    session['scan_thread'] = threading.Thread(
+        target=progressive_scan_window,
+        args=(session, start, end),
+        daemon=True
+    )
+    session['scan_thread'].start()
+
+def progressive_scan_window(session, start, end):
+    """Scan one window of a partial upload so infections are caught before the upload finishes"""
+    window_path = f"{session['path']}.window"
+    try:
+        with open(session['path'], 'rb') as src, open(window_path, 'wb') as dst:
+            src.seek(start)
+            remaining = end - start
+            while remaining:
+                data = src.read(min(UPLOAD_READ_SIZE, remaining))
+                if not data:
+                    break
+                dst.write(data)
+                remaining -= len(data)
+        
+        scan_result = split_limit_alerts(
+            run_clamscan(window_path, recursive=False, max_size=PROGRESSIVE_SCAN_BYTES + PROGRESSIVE_SCAN_OVERLAP)
+        )
+    finally:
+        if os.path.exists(window_path):
+            os.remove(window_path)
+    
+    with session['lock']:
+        if session['status'] != 'uploading':
+            return
+        if not scan_result['success']:
+            app.logger.warning(f"Progressive scan of upload {session['id']} failed: {scan_result.get('error')}")
+            return
+        
+        session['scanned'] = end
+        if scan_result['infected_count'] > 0:
+            virus = scan_result['infected_files'][0]['virus']
+            app.logger.warning(f"Infection {virus} found in partial upload {session['id']}, aborting upload")
+            complete_upload_session(session, {
+                'success': True,
+                'infected_count': 1,
+                'infected_files': [{'file': session['filename'], 'virus': virus}],
+                'scan_duration': scan_result['scan_duration'],
+                'partial': True
+            })
+        else:
+            start_progressive_scan(session)
+
+def complete_upload_session(session, scan_result):
+    """Quarantine or remove the spooled file and log the scan (caller holds session lock)"""
+    if scan_result['success'] and scan_result['infected_count'] > 0:
+        quarantine_file(session['path'], scan_result['infected_files'][0]['virus'])
+    if os.path.exists(session['path']):
+        os.remove(session['path'])
+    
+    details = json.dumps({
+        'size': session['size'],
+        'received': session['received'],
+        'sha256': session['hasher'].hexdigest() if session['received'] == session['size'] else None,
+        'chunked': True,
+        'limits_exceeded': scan_result.get('limits_exceeded', [])
+    })
+    
+    if not scan_result['success']:
+        status = 'failed'
+    elif scan_result.get('infected_count'):
+        status = 'infected'
+    elif not scan_result.get('fully_scanned', True):
+        status = 'incomplete'  # ClamAV skipped or could not read part of the file; never report it clean
+    else:
+        status = 'completed'
+    
+    log_scan('upload', session['filename'], 'completed' if status == 'infected' else status,
+             scan_result.get('infected_count', 0), 1, scan_result.get('scan_duration', 0), details,
+             session['received'])
+    
+    session['status'] = status
+    session['result'] = scan_result
+
+def start_upload_finalize(session):
+    """Move a fully received upload to 'scanning' and scan it in the background (caller holds session lock)"""
+    if session['status'] != 'uploading':
+        return
+    # Progressive windows stop once the status leaves 'uploading'; the full scan covers everything
+    session['status'] = 'scanning'
+    session['updated'] = time.time()
+    threading.Thread(target=finalize_upload_session, args=(session,), daemon=True).start()
+
+def finalize_upload_session(session):
+    """Run the authoritative full-file scan; clients poll the session for the result"""
+    with session['lock']:
+        thread = session['scan_thread']
+    if thread is not None:
+        thread.join()
+    
+    timeout = SCAN_TIMEOUT + session['size'] // (1024 * 1024) * UPLOAD_SCAN_SECONDS_PER_MB
+    scan_result = split_limit_alerts(
+        run_clamscan(session['path'], recursive=False, max_size=CLAMAV_MAX_SCAN_SIZE, timeout=timeout)
+    )
+    if scan_result['success']:
+        for item in scan_result['infected_files'] + scan_result['limits_exceeded']:
+            item['file'] = session['filename']
+    
+    with session['lock']:
+        complete_upload_session(session, scan_result)
+        session['updated'] = time.time()
+
+# Single-flight scan coalescing
+inflight_lock = threading.Lock()
+inflight_scans = {}
+signature_state = {'version': None, 'checked': 0}
+
+def get_signature_version():
+    """Return the loaded ClamAV engine/signature version, cached for SIGNATURE_VERSION_TTL"""
+    now = time.time()
+    with inflight_lock:
+        if signature_state['version'] is not None and now - signature_state['checked'] < SIGNATURE_VERSION_TTL:
+            return signature_state['version']
+    
+    try:
+        result = subprocess.run(['clamscan', '--version'], capture_output=True, text=True, timeout=10)
+        version = result.stdout.strip() or 'unknown'
+    except Exception:
+        version = 'unknown'
+    
+    with inflight_lock:
+        signature_state['version'] = version
+        signature_state['checked'] = now
+    return version
+
+def coalesced_scan(path, recursive):
+    """Run a custom scan, sharing one clamscan run between identical concurrent requests.
+    
+    Returns (scan_result, shared) where shared is None for the request that ran
+    the scan, 'coalesced' when it attached to a running scan and 'reused' when
+    it got a result finished within SCAN_RESULT_REUSE_SECONDS.
+    """
+    key = (os.path.realpath(path), bool(recursive), get_signature_version())
+    now = time.time()
+    
+    with inflight_lock:
+        for stale_key in [k for k, v in inflight_scans.items()
+                          if v['finished'] is not None and now - v['finished'] > SCAN_RESULT_REUSE_SECONDS]:
+            del inflight_scans[stale_key]
+        
+        entry = inflight_scans.get(key)
+        if entry is None:
+            entry = {'done': threading.Event(), 'result': None, 'finished': None}
+            inflight_scans[key] = entry
+            leader = True
+        else:
+            leader = False
+            shared = 'reused' if entry['finished'] is not None else 'coalesced'
+    
+    if not leader:
+        entry['done'].wait()
+        return entry['result'], shared
+    
+    try:
+        scan_result = run_clamscan(path, recursive)
+        log_scan('custom', path, 'completed' if scan_result['success'] else 'failed',
+                 scan_result.get('infected_count', 0), 0, scan_result.get('scan_duration', 0))
+    except Exception as e:
+        scan_result = {'success': False, 'error': str(e), 'scan_duration': 0}
+    finally:
+        with inflight_lock:
+            entry['result'] = scan_result
+            entry['finished'] = time.time()
+            if not scan_result['success'] or SCAN_RESULT_REUSE_SECONDS <= 0:
+                # Failures are never reused; waiters already attached still get this result
+                inflight_scans.pop(key, None)
+        entry['done'].set()
+    
+    return scan_result, None
+
+# Streaming export
+def parse_export_date(value, end=False):
+    """Normalise an ISO date/datetime query value to the SQLite (UTC) timestamp format.
+    
+    Values with an offset are converted to UTC; naive values are taken as UTC.
+    A date-only end value covers that whole day.
+    """
+    if not value:
+        return None
+    
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed.strftime('%Y-%m-%d %H:%M:%S')
+
+def iter_export_rows(table, columns, start=None, end=None):
+    """Yield rows from a table in timestamp order without loading them all into memory.
+    
+    Each batch is its own short keyset query, so a slow client never holds a
+    read lock on the database between batches.
+    """
+    conditions = []
+    params = []
+    if start:
+        conditions.append('timestamp >= ?')
+        params.append(start)
+    if end:
+        conditions.append('timestamp < ?')
+        params.append(end)
+    
+    timestamp_index = columns.index('timestamp')
+    id_index = columns.index('id')
+    last_key = None
+    
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        cursor = conn.cursor()
+        while True:
+            batch_conditions = list(conditions)
+            batch_params = list(params)
+            if last_key:
+                batch_conditions.append('(timestamp, id) > (?, ?)')
+                batch_params.extend(last_key)
+            where = f"WHERE {' AND '.join(batch_conditions)}" if batch_conditions else ''
+            
+            rows = cursor.execute(
+                f"SELECT {', '.join(columns)} FROM {table} {where} ORDER BY timestamp, id LIMIT ?",
+                batch_params + [EXPORT_BATCH_SIZE]
+            ).fetchall()
+            if not rows:
+                break
+            last_key = (rows[-1][timestamp_index], rows[-1][id_index])
+            yield rows
+    finally:
+        conn.close()
+
+def iter_ndjson(columns, batches):
+    """Encode row batches as newline-delimited JSON"""
+    for rows in batches:
+        yield ''.join(json.dumps(dict(zip(columns, row))) + '\n' for row in rows)
+
+def iter_csv(columns, batches):
+    """Encode row batches as CSV with a header line"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def iter_gzip(chunks):
+    """Compress a stream of text chunks into a gzip stream"""
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+# Dashboard event stream
+event_lock = threading.Lock()
+event_subscribers = set()
+event_history = deque(maxlen=EVENT_REPLAY_SIZE)
+# Ids start from the startup time in ms so a Last-Event-ID from before a restart never matches
+event_state = {'next_id': int(time.time() * 1000), 'producer': None, 'metrics': None}
+
+def format_event(event):
+    """Encode an event in Server-Sent Events wire format"""
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+
+def publish_event(event_type, data):
+    """Fan an event out to every connected dashboard"""
+    with event_lock:
+        event = {'id': event_state['next_id'], 'type': event_type, 'data': data}
+        event_state['next_id'] += 1
+        event_history.append(event)
+        subscribers = list(event_subscribers)
+    
+    for subscriber in subscribers:
+        try:
+            subscriber.put_nowait(event)
+        except queue.Full:
+            # Slow client: drop it, the browser reconnects and resyncs
+            with event_lock:
+                event_subscribers.discard(subscriber)
+            subscriber.dropped = True
+
+def subscribe_events(last_event_id=None):
+    """Register a dashboard client, returning its queue, any missed events and
+    whether the replay buffer cannot cover the gap (the client must resync)"""
+    subscriber = queue.Queue(maxsize=EVENT_QUEUE_SIZE)
+    subscriber.dropped = False
+    with event_lock:
+        event_subscribers.add(subscriber)
+        missed = []
+        resync = False
+        if last_event_id is not None:
+            oldest = event_history[0]['id'] if event_history else event_state['next_id']
+            if oldest - 1 <= last_event_id < event_state['next_id']:
+                missed = [event for event in event_history if event['id'] > last_event_id]
+            else:
+                resync = True  # Evicted from the buffer, or an id from before a restart
+        
+        producer = event_state['producer']
+        if producer is None or not producer.is_alive():
+            producer = threading.Thread(target=produce_metrics_events, daemon=True)
+            event_state['producer'] = producer
+            producer.start()
+    
+    return subscriber, missed, resync
+
+def unsubscribe_events(subscriber):
+    """Remove a disconnected dashboard client"""
+    with event_lock:
+        event_subscribers.discard(subscriber)
+
+def metrics_delta(previous, current):
+    """Return only the metrics that changed noticeably since the last sample"""
+    if previous is None or 'error' in current:
+        return current
+    
+    delta = {}
+    for key, value in current.items():
+        old = previous.get(key)
+        if isinstance(value, float):
+            if old is None or round(value, 1) != round(old, 1):
+                delta[key] = value
+        elif value != old:
+            delta[key] = value
+    return delta
+
+def produce_metrics_events():
+    """Single producer: sample system metrics once for all clients while any are connected"""
+    while True:
+        with event_lock:
+            if not event_subscribers:
+                event_state['producer'] = None
+                return
+        
+        metrics = get_system_metrics()
+        with event_lock:
+            delta = metrics_delta(event_state['metrics'], metrics)
+            if 'error' not in metrics:
+                event_state['metrics'] = metrics
+        
+        if delta:
+            publish_event('metrics', delta)
+        
+        time.sleep(METRICS_COLLECTION_INTERVAL)
+
+# Distributed scanning
+cluster_lock = threading.Lock()
+distributed_jobs = {}
+cluster_workers = {
+    url: {'url': url, 'alive': True, 'last_seen': None, 'retry_at': 0, 'active': set()}
+    for url in WORKER_NODES
+}
+MAX_FINISHED_JOBS = 100
+
+def cluster_headers():
+    """Headers sent with node-to-node requests"""
+    headers = {'Content-Type': 'application/json'}
+    if CLUSTER_TOKEN:
+        headers['X-Cluster-Token'] = CLUSTER_TOKEN
+    return headers
+
+def cluster_authorized():
+    """Check the shared cluster token on an incoming node-to-node request"""
+    if not CLUSTER_TOKEN:
+        return False
+    return hmac.compare_digest(request.headers.get('X-Cluster-Token', ''), CLUSTER_TOKEN)
+
+def cluster_config_errors():
+    """List settings a coordinator or worker cannot run safely without"""
+    errors = []
+    if NODE_ROLE in ('coordinator', 'worker') and not CLUSTER_TOKEN:
+        errors.append('CLAMAV_CLUSTER_TOKEN must be set for coordinator and worker nodes')
+    if NODE_ROLE == 'worker' and not COORDINATOR_URL:
+        errors.append('CLAMAV_COORDINATOR_URL must be set on worker nodes')
+    return errors
+
+def measure_tree(path):
+    """Count files and bytes under each directory of a tree, keyed by directory path"""
+    sizes = {}
+    
+    def unreadable(error):
+        sizes[error.filename] = (1, 0)  # Keep it as a unit so the worker reports the error
+    
+    for root, dirs, files in os.walk(path, topdown=False, onerror=unreadable):
+        count, total = 0, 0
+        for name in files:
+            try:
+                stat = os.lstat(os.path.join(root, name))
+            except OSError:
+                continue
+            count += 1
+            total += stat.st_size
+        for name in dirs:
+            sub_count, sub_total = sizes.get(os.path.join(root, name), (0, 0))
+            count += sub_count
+            total += sub_total
+        sizes[root] = (count, total)
+    return sizes
+
+def split_scan_path(path, recursive=True):
+    """Split a scan path into work units (lists of paths)
+    
+    Directories are descended until each unit holds at most WORK_UNIT_MAX_FILES
+    files and WORK_UNIT_MAX_BYTES bytes; a single file over the byte limit gets
+    a unit of its own.
+    """
+    if not os.path.isdir(path):
+        return [[path]]
+    
+    sizes = measure_tree(path) if recursive else {}
+    units = []
+    batch = {'paths': [], 'files': 0, 'bytes': 0}
+    
+    def add(item_path, files, size):
+        if batch['paths'] and (batch['files'] + files > WORK_UNIT_MAX_FILES or
+                               batch['bytes'] + size > WORK_UNIT_MAX_BYTES):
+            units.append(batch['paths'])
+            batch.update(paths=[], files=0, bytes=0)
+        batch['paths'].append(item_path)
+        batch['files'] += files
+        batch['bytes'] += size
+    
+    def visit(directory):
+        try:
+            with os.scandir(directory) as iterator:
+                entries = sorted(iterator, key=lambda entry: entry.name)
+        except OSError:
+            add(directory, 1, 0)  # Let the worker report why it cannot be read
+            return
+        
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if not recursive:
+                    continue
+                files, size = sizes.get(entry.path, (0, 0))
+                if files <= WORK_UNIT_MAX_FILES and size <= WORK_UNIT_MAX_BYTES:
+                    if files:
+                        add(entry.path, files, size)
+                else:
+                    visit(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                try:
+                    size = entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    size = 0
+                add(entry.path, 1, size)
+    
+    visit(path)
+    if batch['paths']:
+        units.append(batch['paths'])
+    
+    return units
+
+def create_distributed_job(path, recursive):
+    """Register a new distributed scan job and its work units"""
+    job_id = str(uuid.uuid4())
+    units = {}
+    for paths in split_scan_path(path, recursive):
+        unit_id = str(uuid.uuid4())
+        units[unit_id] = {
+            'id': unit_id,
+            'paths': paths,
+            'state': 'pending',
+            'worker': None,
+            'lease': None,
+            'lease_expires': 0,
+            'attempts': 0,
+            'result': None
+        }
+    
+    job = {
+        'id': job_id,
+        'path': path,
+        'recursive': recursive,
+        'status': 'running',
+        'started': time.time(),
+        'finished': None,
+        'units': units,
+        'summary': None
+    }
+    
+    with cluster_lock:
+        finished = [j for j in distributed_jobs.values() if j['status'] != 'running']
+        finished.sort(key=lambda j: j['finished'])
+        for old_job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS + 1)]:
+            del distributed_jobs[old_job['id']]
+        distributed_jobs[job_id] = job
+    
+    return job
+
+def select_worker():
+    """Pick the least loaded live worker with spare capacity (caller holds cluster_lock)"""
+    now = time.time()
+    candidates = [
+        w for w in cluster_workers.values()
+        if (w['alive'] or w['retry_at'] <= now) and len(w['active']) < WORKER_MAX_UNITS
+    ]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda w: len(w['active']))
+
+def release_unit(unit, reason):
+    """Return a leased unit to the pending pool, or fail it after too many attempts (caller holds cluster_lock)"""
+    worker = cluster_workers.get(unit['worker'])
+    if worker:
+        worker['active'].discard(unit['id'])
+    
+    unit['worker'] = None
+    unit['lease'] = None
+    if unit['attempts'] >= RETRY_ATTEMPTS:
+        unit['state'] = 'failed'
+        unit['result'] = {'success': False, 'error': reason}
+    else:
+        unit['state'] = 'pending'
+
+def mark_worker_dead(worker):
+    """Take a worker out of rotation until LEASE_TIMEOUT has passed (caller holds cluster_lock)"""
+    worker['alive'] = False
+    worker['retry_at'] = time.time() + LEASE_TIMEOUT
+
+def reap_expired_leases(job):
+    """Reassign units whose worker stopped sending heartbeats (caller holds cluster_lock)"""
+    now = time.time()
+    for unit in job['units'].values():
+        if unit['state'] == 'leased' and unit['lease_expires'] < now:
+            worker = cluster_workers.get(unit['worker'])
+            app.logger.warning(f"Lease expired for unit {unit['id']} on {unit['worker']}, reassigning")
+            if worker:
+                mark_worker_dead(worker)
+            release_unit(unit, f"Lease expired on {unit['worker']}")
+
+def dispatch_work_unit(job, unit, worker):
+    """Lease a work unit to a worker and send it over HTTP"""
+    lease = str(uuid.uuid4())
+    with cluster_lock:
+        # The pending list is a snapshot; a stale lease may have completed the unit since
+        if unit['state'] != 'pending':
+            return False
+        unit['state'] = 'leased'
+        unit['worker'] = worker['url']
+        unit['lease'] = lease
+        unit['lease_expires'] = time.time() + LEASE_TIMEOUT
+        unit['attempts'] += 1
+        worker['active'].add(unit['id'])
+    
+    payload = {
+        'job_id': job['id'],
+        'unit_id': unit['id'],
+        'lease': lease,
+        'paths': unit['paths'],
+        'recursive': job['recursive'],
+        'worker': worker['url']
+    }
+    
+    try:
+        response = requests.post(f"{worker['url']}/api/worker/units", json=payload,
+                                 headers=cluster_headers(), timeout=DISPATCH_TIMEOUT)
+        response.raise_for_status()
+        return True
+    except requests.RequestException as e:
+        app.logger.warning(f"Failed to dispatch unit {unit['id']} to {worker['url']}: {e}")
+        with cluster_lock:
+            mark_worker_dead(worker)
+            if unit['lease'] == lease:
+                # The unit never reached the worker, so this does not count as an attempt
+                unit['attempts'] -= 1
+                release_unit(unit, f"Dispatch to {worker['url']} failed: {e}")
+        return False
+
+def run_distributed_job(job_id):
+    """Coordinator loop: dispatch pending units, reap dead leases, merge results"""
+    job = distributed_jobs[job_id]
+    deadline = job['started'] + DISTRIBUTED_SCAN_TIMEOUT
+    
+    while True:
+        with cluster_lock:
+            reap_expired_leases(job)
+            pending = [u for u in job['units'].values() if u['state'] == 'pending']
+            remaining = [u for u in job['units'].values() if u['state'] in ('pending', 'leased')]
+            
+            if remaining and time.time() > deadline:
+                for unit in remaining:
+                    unit['attempts'] = RETRY_ATTEMPTS
+                    release_unit(unit, 'Distributed scan timeout exceeded')
+                remaining = []
+        
+        if not remaining:
+            break
+        
+        for unit in pending:
+            with cluster_lock:
+                worker = select_worker()
+            if not worker:
+                break
+            dispatch_work_unit(job, unit, worker)
+        
+        time.sleep(1)
+    
+    finalize_distributed_job(job)
+
+def finalize_distributed_job(job):
+    """Merge unit results into a single scan_history entry"""
+    with cluster_lock:
+        units = list(job['units'].values())
+    
+    infected_files = []
+    failed_units = []
+    workers = set()
+    for unit in units:
+        result = unit['result'] or {}
+        if unit['state'] == 'done' and result.get('success'):
+            infected_files.extend(result.get('infected_files', []))
+            workers.add(result.get('worker'))
+        else:
+            failed_units.append({'paths': unit['paths'], 'error': result.get('error')})
+    
+    scan_duration = time.time() - job['started']
+    status = 'completed' if not failed_units else 'failed'
+    summary = {
+        'job_id': job['id'],
+        'units': len(units),
+        'failed_units': failed_units,
+        'workers': sorted(w for w in workers if w),
+        'infected_files': infected_files
+    }
+    
+    log_scan('distributed', job['path'], status, len(infected_files), 0, scan_duration, json.dumps(summary))
+    
+    with cluster_lock:
+        job['summary'] = summary
+        job['status'] = status
+        job['finished'] = time.time()
+
+def record_unit_heartbeat(data):
+    """Extend the lease of a unit a worker is still scanning"""
+    with cluster_lock:
+        worker = cluster_workers.get(data.get('worker'))
+        if worker:
+            worker['alive'] = True
+            worker['last_seen'] = time.time()
+        
+        job = distributed_jobs.get(data.get('job_id'))
+        unit = job['units'].get(data.get('unit_id')) if job else None
+        if not unit or unit['state'] != 'leased' or unit['lease'] != data.get('lease'):
+            return False
+        
+        unit['lease_expires'] = time.time() + LEASE_TIMEOUT
+        return True
+
+def record_unit_result(data):
+    """Store a worker's result for a unit; the first result for a unit wins"""
+    with cluster_lock:
+        worker = cluster_workers.get(data.get('worker'))
+        if worker:
+            worker['alive'] = True
+            worker['last_seen'] = time.time()
+            worker['active'].discard(data.get('unit_id'))
+        
+        job = distributed_jobs.get(data.get('job_id'))
+        unit = job['units'].get(data.get('unit_id')) if job else None
+        if not unit or unit['state'] in ('done', 'failed'):
+            return False
+        
+        result = data.get('result') or {}
+        result['worker'] = data.get('worker')
+        if unit['lease'] != data.get('lease'):
+            # Result from a reassigned lease: a success is still valid, a failure
+            # must not disturb the current lease holder
+            if not result.get('success'):
+                return True
+            current = cluster_workers.get(unit['worker'])
+            if current:
+                current['active'].discard(unit['id'])
+        
+        if result.get('success'):
+            unit['state'] = 'done'
+            unit['result'] = result
+        else:
+            release_unit(unit, result.get('error', 'Scan failed on worker'))
+        return True
+
+def send_to_coordinator(coordinator_url, endpoint, payload, attempts=1):
+    """POST a worker message to the coordinator, retrying on failure"""
+    for attempt in range(attempts):
+        try:
+            response = requests.post(f"{coordinator_url}{endpoint}", json=payload,
+                                     headers=cluster_headers(), timeout=DISPATCH_TIMEOUT)
+            return response.status_code == 200
+        except requests.RequestException as e:
+            app.logger.warning(f"Failed to reach coordinator at {coordinator_url}: {e}")
+            if attempt < attempts - 1:
+                time.sleep(RETRY_DELAY)
+    return False
+
+def execute_work_unit(unit):
+    """Worker side: scan a unit, heartbeat while running, then report the result"""
+    coordinator_url = COORDINATOR_URL
+    message = {key: unit[key] for key in ('job_id', 'unit_id', 'lease', 'worker')}
+    finished = threading.Event()
+    
+    def heartbeat():
+        while not finished.wait(HEARTBEAT_INTERVAL):
+            send_to_coordinator(coordinator_url, '/api/cluster/heartbeat', message)
+    
+    threading.Thread(target=heartbeat, daemon=True).start()
+    try:
+        # Paths are resolved on this host; a missing mount must fail the unit, not pass it as clean
+        missing = [path for path in unit['paths'] if not os.path.exists(path)]
+        if missing:
+            result = {'success': False, 'error': f"Paths not found on worker: {', '.join(missing[:5])}"}
+        else:
+            result = run_clamscan(unit['paths'], unit['recursive'], timeout=WORKER_SCAN_TIMEOUT)
+            if result['success'] and result['returncode'] not in (0, 1):
+                result = {'success': False,
+                          'error': result['error'].strip() or f"clamscan exited with code {result['returncode']}"}
+    finally:
+        finished.set()
+    
+    if not send_to_coordinator(coordinator_url, '/api/cluster/result', {**message, 'result': result},
+                               attempts=RETRY_ATTEMPTS):
+        app.logger.error(f"Could not report result for unit {unit['unit_id']}, coordinator will reassign it")
+
+def get_distributed_job_status(job):
+    """Summarise a distributed job for the API (caller holds cluster_lock)"""
+    states = {}
+    for unit in job['units'].values():
+        states[unit['state']] = states.get(unit['state'], 0) + 1
+    
+    return {
+        'job_id': job['id'],
+        'path': job['path'],
+        'status': job['status'],
+        'units': states,
+        'started': datetime.fromtimestamp(job['started']).isoformat(),
+        'finished': datetime.fromtimestamp(job['finished']).isoformat() if job['finished'] else None,
+        'summary': job['summary']
+    }
+
 # Routes
 @app.route('/')
 def index():
@@ -404,16 +1887,14 @@ def custom_scan():
     if not path or not os.path.exists(path):
         return jsonify({'error': 'Invalid path'}), 400
     
-    scan_result = run_clamscan(path, recursive)
-    
-    # Log scan
-    log_scan('custom', path, 'completed' if scan_result['success'] else 'failed',
-             scan_result.get('infected_count', 0), 0, scan_result.get('scan_duration', 0))
+    # Identical concurrent requests share one scan (and one history entry)
+    scan_result, shared = coalesced_scan(path, recursive)
     
     return jsonify({
         'scan_type': 'custom',
         'path': path,
         'result': scan_result,
+        'shared': shared,
         'timestamp': datetime.now().isoformat()
     })
 
@@ -432,6 +1913,7 @@ def upload_scan():
     
     try:
         file.save(upload_path)
+        file_size = os.path.getsize(upload_path)
         
         # Scan the uploaded file
         scan_result = run_clamscan(upload_path, recursive=False)
@@ -447,7 +1929,8 @@ def upload_scan():
         
         # Log scan
         log_scan('upload', filename, 'completed' if scan_result['success'] else 'failed',
-                 scan_result.get('infected_count', 0), 1, scan_result.get('scan_duration', 0))
+                 scan_result.get('infected_count', 0), 1, scan_result.get('scan_duration', 0),
+                 bytes_scanned=file_size)
         
         return jsonify({
             'scan_type': 'upload',
@@ -459,6 +1942,109 @@ def upload_scan():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/upload/sessions', methods=['POST'])
+def create_upload():
+    """Start a resumable chunked upload"""
+    data = request.get_json()
+    filename = secure_filename(data.get('filename', ''))
+    size = data.get('size')
+    
+    if not filename:
+        return jsonify({'error': 'No file selected'}), 400
+    if not isinstance(size, int) or size <= 0:
+        return jsonify({'error': 'File size must be a positive integer'}), 400
+    if size > CHUNKED_UPLOAD_MAX_SIZE:
+        return jsonify({'error': f'File exceeds maximum upload size of {CHUNKED_UPLOAD_MAX_SIZE} bytes '
+                                 '(ClamAV cannot scan files of 2GB or more)'}), 413
+    
+    session = create_upload_session(filename, size, data.get('sha256'))
+    return jsonify(get_upload_session_status(session)), 201
+
+@app.route('/api/upload/sessions/<session_id>')
+def get_upload(session_id):
+    """Get upload progress, including the offset to resume from"""
+    with upload_lock:
+        session = upload_sessions.get(session_id)
+    if not session:
+        return jsonify({'error': 'Upload session not found'}), 404
+    return jsonify(get_upload_session_status(session))
+
+@app.route('/api/upload/sessions/<session_id>', methods=['PUT'])
+def put_upload_chunk(session_id):
+    """Upload one chunk at ?offset=N; retried chunks are deduplicated"""
+    with upload_lock:
+        session = upload_sessions.get(session_id)
+    if not session:
+        return jsonify({'error': 'Upload session not found'}), 404
+    
+    offset = request.args.get('offset', type=int)
+    length = request.content_length
+    if offset is None or offset < 0:
+        return jsonify({'error': 'Chunk offset required'}), 400
+    if not length or length > CHUNKED_UPLOAD_CHUNK_SIZE:
+        return jsonify({'error': f'Chunk must be 1 to {CHUNKED_UPLOAD_CHUNK_SIZE} bytes'}), 400
+    if offset + length > session['size']:
+        return jsonify({'error': 'Chunk extends past declared file size'}), 400
+    
+    with session['lock']:
+        if session['status'] != 'uploading':
+            return jsonify({'error': f"Upload is {session['status']}", 'result': session['result']}), 409
+        
+        try:
+            outcome = write_upload_chunk(session, offset, length, request.stream)
+        except ValueError as e:
+            return jsonify({'error': str(e), 'offset': session['received']}), 409
+        
+        session['updated'] = time.time()
+        start_progressive_scan(session)
+        status = get_upload_session_status(session)
+    
+    status['chunk'] = outcome
+    return jsonify(status)
+
+@app.route('/api/upload/sessions/<session_id>/finalize', methods=['POST'])
+def finalize_upload(session_id):
+    """Complete a chunked upload: verify size and hash, then start the scan (202 until it finishes)"""
+    with upload_lock:
+        session = upload_sessions.get(session_id)
+    if not session:
+        return jsonify({'error': 'Upload session not found'}), 404
+    
+    with session['lock']:
+        uploading = session['status'] == 'uploading'
+        if uploading and session['received'] != session['size']:
+            return jsonify({'error': 'Upload incomplete', 'offset': session['received']}), 409
+        sha256 = session['hasher'].hexdigest()
+        expected = session['expected_sha256']
+    
+    if uploading and expected and expected.lower() != sha256:
+        discard_upload_session(session_id)
+        return jsonify({'error': 'SHA-256 mismatch', 'sha256': sha256}), 422
+    
+    # The finished session is kept until it expires so a retried finalize gets the same result
+    with session['lock']:
+        start_upload_finalize(session)
+        if session['status'] == 'scanning':
+            return jsonify(get_upload_session_status(session)), 202
+        scan_result = session['result']
+    
+    return jsonify({
+        'scan_type': 'upload',
+        'filename': session['filename'],
+        'sha256': sha256 if session['received'] == session['size'] else None,
+        'result': scan_result,
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/api/upload/sessions/<session_id>', methods=['DELETE'])
+def abort_upload(session_id):
+    """Abandon a chunked upload"""
+    with upload_lock:
+        if session_id not in upload_sessions:
+            return jsonify({'error': 'Upload session not found'}), 404
+    discard_upload_session(session_id)
+    return jsonify({'message': 'Upload session removed'})
+
 @app.route('/api/history')
 def get_history():
     """Get scan history"""
@@ -466,12 +2052,98 @@ def get_history():
     history = get_scan_history(limit)
     return jsonify(history)
 
+@app.route('/api/export/<dataset>')
+def export_records(dataset):
+    """Stream scan history or quarantine records as NDJSON or CSV"""
+    if dataset not in EXPORT_TABLES:
+        return jsonify({'error': 'Unknown dataset'}), 404
+    
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'error': 'Format must be ndjson or csv'}), 400
+    
+    try:
+        start = parse_export_date(request.args.get('start'))
+        end = parse_export_date(request.args.get('end'), end=True)
+    except ValueError:
+        return jsonify({'error': 'Dates must be ISO 8601 (YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS[+HH:MM]); '
+                                 'times without an offset are UTC, a date-only end includes that day, '
+                                 'a datetime end is exclusive'}), 400
+    
+    table, columns = EXPORT_TABLES[dataset]
+    batches = iter_export_rows(table, columns, start, end)
+    if export_format == 'csv':
+        chunks = iter_csv(columns, batches)
+        mimetype = 'text/csv'
+    else:
+        chunks = iter_ndjson(columns, batches)
+        mimetype = 'application/x-ndjson'
+    
+    filename = f"{dataset}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+    if request.args.get('gzip', 'false').lower() == 'true':
+        chunks = iter_gzip(chunks)
+        mimetype = 'application/gzip'
+        filename += '.gz'
+    
+    response = Response(chunks, mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
+
+@app.route('/api/summary')
+def get_summary():
+    """Dashboard summary served from the rollup tables"""
+    days = min(max(request.args.get('days', 7, type=int), 1), 366)
+    return jsonify(get_dashboard_summary(days))
+
+@app.route('/api/admin/maintenance', methods=['POST'])
+def trigger_maintenance():
+    """Run rollups, retention pruning and incremental vacuum now"""
+    if not admin_authorized():
+        return jsonify({'error': 'Unauthorized'}), 403
+    return jsonify(run_maintenance(prune=True))
+
 @app.route('/api/metrics')
 def get_metrics():
     """Get system metrics"""
     metrics = get_system_metrics()
     return jsonify(metrics)
 
+@app.route('/api/events')
+def event_stream():
+    """Stream metrics, history, quarantine and scan events to the dashboard (SSE)"""
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    subscriber, missed, resync = subscribe_events(last_event_id)
+    
+    def generate():
+        try:
+            yield f"retry: {METRICS_COLLECTION_INTERVAL * 1000}\n\n"
+            
+            # Full metrics snapshot so a fresh client does not wait for the next sample
+            with event_lock:
+                snapshot = event_state['metrics']
+            if snapshot and (last_event_id is None or resync):
+                yield f"event: metrics\ndata: {json.dumps(snapshot)}\n\n"
+            if resync:
+                yield 'event: resync\ndata: {}\n\n'
+            
+            for event in missed:
+                yield format_event(event)
+            
+            while not subscriber.dropped:
+                try:
+                    event = subscriber.get(timeout=EVENT_KEEPALIVE_INTERVAL)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield format_event(event)
+        finally:
+            unsubscribe_events(subscriber)
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/api/diagnostics')
 def get_diagnostics():
     """Run system diagnostics"""
@@ -491,8 +2163,9 @@ def remove_quarantine(file_id):
     cursor = conn.cursor()
     
     # Get file info
-    cursor.execute('SELECT quarantine_path FROM quarantine WHERE id = ?', (file_id,))
-    result = cursor.fetchone()
+    with profile_span('sqlite'):
+        cursor.execute('SELECT quarantine_path FROM quarantine WHERE id = ?', (file_id,))
+        result = cursor.fetchone()
     
     if not result:
         conn.close()
@@ -502,23 +2175,161 @@ def remove_quarantine(file_id):
     
     try:
         # Delete file
-        if os.path.exists(quarantine_path):
-            os.remove(quarantine_path)
+        with profile_span('quarantine_io'):
+            if os.path.exists(quarantine_path):
+                os.remove(quarantine_path)
         
         # Remove from database
-        cursor.execute('DELETE FROM quarantine WHERE id = ?', (file_id,))
-        conn.commit()
+        with profile_span('sqlite'):
+            cursor.execute('DELETE FROM quarantine WHERE id = ?', (file_id,))
+            conn.commit()
         
         conn.close()
+        publish_event('quarantine', {'action': 'removed', 'id': file_id})
         return jsonify({'message': 'File removed from quarantine'})
         
     except Exception as e:
         conn.close()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/scan/distributed', methods=['POST'])
+def distributed_scan():
+    """Split a custom scan into work units and dispatch them to worker nodes"""
+    if NODE_ROLE != 'coordinator':
+        return jsonify({'error': 'This node is not running as a coordinator'}), 400
+    if cluster_config_errors():
+        return jsonify({'error': '; '.join(cluster_config_errors())}), 503
+    if not cluster_workers:
+        return jsonify({'error': 'No worker nodes configured'}), 400
+    
+    data = request.get_json()
+    path = data.get('path', '')
+    recursive = data.get('recursive', True)
+    
+    if not path or not os.path.exists(path):
+        return jsonify({'error': 'Invalid path'}), 400
+    
+    job = create_distributed_job(path, recursive)
+    threading.Thread(target=run_distributed_job, args=(job['id'],), daemon=True).start()
+    
+    with cluster_lock:
+        status = get_distributed_job_status(job)
+    return jsonify(status), 202
+
+@app.route('/api/scan/distributed/<job_id>')
+def get_distributed_scan(job_id):
+    """Get progress of a distributed scan"""
+    with cluster_lock:
+        job = distributed_jobs.get(job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        status = get_distributed_job_status(job)
+    return jsonify(status)
+
+@app.route('/api/cluster/status')
+def get_cluster_status():
+    """Get worker liveness and distributed job overview"""
+    with cluster_lock:
+        workers = [
+            {
+                'url': w['url'],
+                'alive': w['alive'],
+                'last_seen': datetime.fromtimestamp(w['last_seen']).isoformat() if w['last_seen'] else None,
+                'active_units': len(w['active'])
+            }
+            for w in cluster_workers.values()
+        ]
+        jobs = [get_distributed_job_status(job) for job in distributed_jobs.values()]
+    
+    return jsonify({'role': NODE_ROLE, 'workers': workers, 'jobs': jobs})
+
+@app.route('/api/cluster/heartbeat', methods=['POST'])
+def cluster_heartbeat():
+    """Receive a lease heartbeat from a worker"""
+    if not cluster_authorized():
+        return jsonify({'error': 'Unauthorized'}), 403
+    if not record_unit_heartbeat(request.get_json()):
+        return jsonify({'error': 'Lease not held'}), 409
+    return jsonify({'message': 'Lease extended'})
+
+@app.route('/api/cluster/result', methods=['POST'])
+def cluster_result():
+    """Receive a work unit result from a worker"""
+    if not cluster_authorized():
+        return jsonify({'error': 'Unauthorized'}), 403
+    if not record_unit_result(request.get_json()):
+        return jsonify({'error': 'Unit already completed'}), 409
+    return jsonify({'message': 'Result recorded'})
+
+@app.route('/api/worker/units', methods=['POST'])
+def accept_work_unit():
+    """Accept a work unit from the coordinator and scan it in the background"""
+    if NODE_ROLE != 'worker':
+        return jsonify({'error': 'This node is not running as a worker'}), 400
+    if cluster_config_errors():
+        return jsonify({'error': '; '.join(cluster_config_errors())}), 503
+    if not cluster_authorized():
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    unit = request.get_json()
+    missing = [key for key in ('job_id', 'unit_id', 'lease', 'paths', 'worker') if key not in unit]
+    if missing:
+        return jsonify({'error': f'Missing fields: {", ".join(missing)}'}), 400
+    unit.setdefault('recursive', True)
+    
+    threading.Thread(target=execute_work_unit, args=(unit,), daemon=True).start()
+    return jsonify({'message': 'Work unit accepted', 'unit_id': unit['unit_id']}), 202
+
+@app.route('/api/admin/profiles')
+def list_profiles():
+    """List recent slow or sampled request profiles"""
+    if not (PROFILING_ENABLED or PERFORMANCE_MONITORING_ENABLED):
+        return jsonify({'error': 'Profiling is disabled'}), 404
+    if not admin_authorized():
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    with profile_lock:
+        records = list(profile_store)
+    
+    return jsonify([
+        {key: record[key] for key in ('id', 'method', 'path', 'status', 'duration_ms', 'timestamp',
+                                      'slow', 'sampled', 'span_totals')}
+        for record in reversed(records)
+    ])
+
+@app.route('/api/admin/profiles/<int:profile_id>')
+def download_profile(profile_id):
+    """Download one profile as JSON, or as a pstats file with ?format=pstats"""
+    if not (PROFILING_ENABLED or PERFORMANCE_MONITORING_ENABLED):
+        return jsonify({'error': 'Profiling is disabled'}), 404
+    if not admin_authorized():
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    with profile_lock:
+        record = next((r for r in profile_store if r['id'] == profile_id), None)
+    if not record:
+        return jsonify({'error': 'Profile not found'}), 404
+    
+    if request.args.get('format') == 'pstats':
+        if not record['pstats']:
+            return jsonify({'error': 'Request was not sampled by cProfile'}), 404
+        response = Response(record['pstats'], mimetype='application/octet-stream')
+        response.headers['Content-Disposition'] = f'attachment; filename=request_{profile_id}.prof'
+        return response
+    
+    return jsonify({key: value for key, value in record.items() if key != 'pstats'})
+
 if __name__ == '__main__':
+    # Refuse to run an unauthenticated cluster node
+    for error in cluster_config_errors():
+        app.logger.error(error)
+    if cluster_config_errors():
+        raise SystemExit(1)
+    
     # Initialize database
     init_db()
+    remove_orphaned_upload_files()
+    start_maintenance()
     
     # Start Flask app
     port = int(os.environ.get('CLAMAV_WEB_PORT', 5000))
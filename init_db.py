@@ -19,6 +19,12 @@ def init_database():
     conn = sqlite3.connect(DB_FILE)
     cursor = conn.cursor()
     
+    # Enable incremental vacuum (must be set before the first table is created)
+    cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    
+    # WAL lets readers run alongside scan writes
+    cursor.execute('PRAGMA journal_mode = WAL')
+    
     # Create scan history table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS scan_history (
@@ -30,7 +36,8 @@ def init_database():
             total_files INTEGER DEFAULT 0,
             scan_duration REAL DEFAULT 0,
             timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            details TEXT
+            details TEXT,
+            bytes_scanned INTEGER DEFAULT 0
         )
     ''')
     print("✓ Created scan_history table")
@@ -49,6 +56,29 @@ def init_database():
     ''')
     print("✓ Created quarantine table")
     
+    # Create rollup tables
+    for table in ('scan_rollup_hourly', 'scan_rollup_daily'):
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                bucket TEXT NOT NULL,
+                scan_type TEXT NOT NULL,
+                scans INTEGER DEFAULT 0,
+                failed INTEGER DEFAULT 0,
+                infections INTEGER DEFAULT 0,
+                bytes_scanned INTEGER DEFAULT 0,
+                total_duration REAL DEFAULT 0,
+                max_duration REAL DEFAULT 0,
+                PRIMARY KEY (bucket, scan_type)
+            )
+        ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS maintenance_state (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+    print("✓ Created rollup tables")
+    
     # Create indexes for better performance
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_scan_history_timestamp ON scan_history(timestamp)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_scan_history_type ON scan_history(scan_type)')
@@ -6,6 +6,17 @@
 // Global variables
 let metricsInterval;
 let currentScan = null;
+let eventSource = null;
+let streamConnected = false;
+let currentMetrics = {};
+let historyRecords = [];
+let quarantineRecords = null;
+
+const HISTORY_DISPLAY_LIMIT = 20;
+const STREAM_FALLBACK_DELAY = 10000; // Poll if the stream stays down this long
+const CHUNKED_UPLOAD_THRESHOLD = 50 * 1024 * 1024; // Use resumable uploads above 50MB
+const UPLOAD_SCAN_POLL_INTERVAL = 2000; // ms
+const CHUNK_RETRY_ATTEMPTS = 5;
 
 // Initialize application
 document.addEventListener('DOMContentLoaded', function() {
@@ -14,7 +25,7 @@ document.addEventListener('DOMContentLoaded', function() {
     // Initialize components
     initializeEventListeners();
     loadInitialData();
-    startMetricsRefresh();
+    startEventStream();
     
     // Load data when tabs are shown
     document.querySelectorAll('[data-bs-toggle="tab"]').forEach(tab => {
@@ -22,10 +33,14 @@ document.addEventListener('DOMContentLoaded', function() {
             const target = e.target.getAttribute('data-bs-target');
             switch(target) {
                 case '#history':
-                    loadHistory();
+                    if (!streamConnected) {
+                        loadHistory();
+                    }
                     break;
                 case '#quarantine':
-                    loadQuarantine();
+                    if (!streamConnected || quarantineRecords === null) {
+                        loadQuarantine();
+                    }
                     break;
                 case '#diagnostics':
                     runDiagnostics();
@@ -56,9 +71,102 @@ function loadInitialData() {
     loadHistory();
 }
 
-// Start metrics refresh interval
+// Start metrics refresh interval (fallback when the event stream is unavailable)
 function startMetricsRefresh() {
-    metricsInterval = setInterval(refreshMetrics, 5000); // Refresh every 5 seconds
+    if (!metricsInterval) {
+        metricsInterval = setInterval(refreshMetrics, 5000); // Refresh every 5 seconds
+    }
+}
+
+function stopMetricsRefresh() {
+    if (metricsInterval) {
+        clearInterval(metricsInterval);
+        metricsInterval = null;
+    }
+}
+
+// Event Stream Functions
+function startEventStream() {
+    if (!window.EventSource) {
+        startMetricsRefresh();
+        return;
+    }
+    
+    let fallbackTimer = null;
+    eventSource = new EventSource('/api/events');
+    
+    eventSource.onopen = function() {
+        const wasPolling = Boolean(metricsInterval);
+        streamConnected = true;
+        if (fallbackTimer) {
+            clearTimeout(fallbackTimer);
+            fallbackTimer = null;
+        }
+        stopMetricsRefresh();
+        if (wasPolling) {
+            // Events may have been missed while polling
+            loadHistory();
+            if (quarantineRecords !== null) {
+                loadQuarantine();
+            }
+        }
+    };
+    
+    eventSource.onerror = function() {
+        streamConnected = false;
+        // EventSource reconnects on its own; poll meanwhile if it stays down
+        if (!fallbackTimer) {
+            fallbackTimer = setTimeout(function() {
+                fallbackTimer = null;
+                if (!streamConnected) {
+                    startMetricsRefresh();
+                }
+            }, STREAM_FALLBACK_DELAY);
+        }
+        if (eventSource.readyState === EventSource.CLOSED) {
+            startMetricsRefresh();
+        }
+    };
+    
+    eventSource.addEventListener('resync', function() {
+        // The server could not replay everything missed since the last event
+        loadHistory();
+        if (quarantineRecords !== null) {
+            loadQuarantine();
+        }
+    });
+    
+    eventSource.addEventListener('metrics', function(e) {
+        currentMetrics = { ...currentMetrics, ...JSON.parse(e.data) };
+        updateMetricsDisplay(currentMetrics);
+    });
+    
+    eventSource.addEventListener('history', function(e) {
+        const record = JSON.parse(e.data);
+        if (historyRecords.some(r => r.id === record.id)) {
+            return;
+        }
+        historyRecords = [record, ...historyRecords].slice(0, HISTORY_DISPLAY_LIMIT);
+        displayHistory(historyRecords);
+    });
+    
+    eventSource.addEventListener('quarantine', function(e) {
+        const change = JSON.parse(e.data);
+        if (quarantineRecords === null) {
+            return; // Not loaded yet, the tab fetches the full list when shown
+        }
+        if (change.action === 'added') {
+            quarantineRecords = [change.record, ...quarantineRecords.filter(r => r.id !== change.record.id)];
+        } else if (change.action === 'removed') {
+            quarantineRecords = quarantineRecords.filter(r => r.id !== change.id);
+        }
+        displayQuarantine(quarantineRecords);
+    });
+    
+    eventSource.addEventListener('scan_complete', function(e) {
+        const scan = JSON.parse(e.data);
+        console.log(`Scan completed: ${scan.scan_type} ${scan.path} (${scan.status})`);
+    });
 }
 
 // API Functions
@@ -146,7 +254,9 @@ async function runQuickScan() {
     try {
         const result = await apiCall('/api/scan/quick', { method: 'POST' });
         displayScanResults(result);
-        loadHistory(); // Refresh history
+        if (!streamConnected) {
+            loadHistory(); // Refresh history
+        }
     } catch (error) {
         showError('Quick scan failed: ' + error.message);
     } finally {
@@ -171,7 +281,9 @@ async function runCustomScan() {
             body: JSON.stringify({ path, recursive })
         });
         displayScanResults(result);
-        loadHistory(); // Refresh history
+        if (!streamConnected) {
+            loadHistory(); // Refresh history
+        }
     } catch (error) {
         showError('Custom scan failed: ' + error.message);
     } finally {
@@ -188,6 +300,12 @@ async function uploadAndScan() {
         return;
     }
     
+    if (file.size > CHUNKED_UPLOAD_THRESHOLD) {
+        await uploadInChunks(file);
+        fileInput.value = '';
+        return;
+    }
+    
     showLoading('Uploading and scanning file...');
     
     try {
@@ -205,7 +323,9 @@ async function uploadAndScan() {
         
         const result = await response.json();
         displayScanResults(result);
-        loadHistory(); // Refresh history
+        if (!streamConnected) {
+            loadHistory(); // Refresh history
+        }
         
         // Clear file input
         fileInput.value = '';
@@ -216,6 +336,72 @@ async function uploadAndScan() {
     }
 }
 
+async function uploadInChunks(file) {
+    showLoading('Uploading file...');
+    
+    try {
+        const session = await apiCall('/api/upload/sessions', {
+            method: 'POST',
+            body: JSON.stringify({ filename: file.name, size: file.size })
+        });
+        const sessionUrl = `/api/upload/sessions/${session.session_id}`;
+        let offset = session.offset;
+        let failures = 0;
+        let resync = false;
+        
+        while (offset < file.size) {
+            try {
+                if (resync) {
+                    // Ask the server how much arrived before the failure; this can fail too and is retried
+                    offset = (await apiCall(sessionUrl)).offset;
+                    resync = false;
+                    continue;
+                }
+                const chunk = file.slice(offset, offset + session.chunk_size);
+                const response = await fetch(`${sessionUrl}?offset=${offset}`, { method: 'PUT', body: chunk });
+                const status = await response.json();
+                if (response.status === 409 && status.result) {
+                    // Infection found in the partial upload, the server stopped accepting data
+                    displayScanResults({ scan_type: 'upload', filename: file.name, result: status.result });
+                    return;
+                }
+                if (!response.ok && response.status !== 409) {
+                    throw new Error(`HTTP error! status: ${response.status}`);
+                }
+                offset = status.offset; // On 409 this resyncs to the server's offset
+                failures = 0;
+            } catch (error) {
+                if (++failures >= CHUNK_RETRY_ATTEMPTS) {
+                    throw error;
+                }
+                await new Promise(resolve => setTimeout(resolve, 1000 * failures));
+                resync = true;
+            }
+            document.getElementById('loadingText').textContent =
+                `Uploading file... ${Math.floor(offset / file.size * 100)}%`;
+        }
+        
+        document.getElementById('loadingText').textContent = 'Scanning file...';
+        let result = await apiCall(`${sessionUrl}/finalize`, { method: 'POST' });
+        while (result.status === 'scanning') {
+            // Large files are scanned in the background; poll the session until the scan finishes
+            await new Promise(resolve => setTimeout(resolve, UPLOAD_SCAN_POLL_INTERVAL));
+            result = await apiCall(sessionUrl);
+        }
+        if (!result.scan_type) {
+            result = { scan_type: 'upload', filename: file.name, result: result.result };
+        }
+        displayScanResults(result);
+        if (!streamConnected) {
+            loadHistory(); // Refresh history
+        }
+    } catch (error) {
+        showError('File upload and scan failed: ' + error.message);
+    } finally {
+        hideLoading();
+    }
+}
+
 function displayScanResults(result) {
     const resultsContainer = document.getElementById('scanResults');
     
@@ -251,9 +437,12 @@ function displayScanResults(result) {
         html += `<h6><i class="fas fa-search me-2"></i>${result.scan_type.charAt(0).toUpperCase() + result.scan_type.slice(1)} Scan Results</h6>`;
         
         if (isSuccess) {
+            const incomplete = scanResult.fully_scanned === false && infectedCount === 0;
             html += `<div class="mb-2">
                 <strong>Status:</strong> 
-                ${infectedCount > 0 ? `<span class="virus-badge">${infectedCount} infected files found</span>` : '<span class="safe-badge">Clean</span>'}
+                ${infectedCount > 0 ? `<span class="virus-badge">${infectedCount} infected files found</span>` :
+                  incomplete ? '<span class="virus-badge">Not fully scanned (ClamAV limits exceeded)</span>' :
+                  '<span class="safe-badge">Clean</span>'}
             </div>`;
             
             if (scanResult.scan_duration) {
@@ -279,8 +468,8 @@ function displayScanResults(result) {
 // History Functions
 async function loadHistory() {
     try {
-        const history = await apiCall('/api/history?limit=20');
-        displayHistory(history);
+        historyRecords = await apiCall(`/api/history?limit=${HISTORY_DISPLAY_LIMIT}`);
+        displayHistory(historyRecords);
     } catch (error) {
         console.error('Failed to load history:', error);
         document.getElementById('historyTable').innerHTML = 
@@ -318,8 +507,8 @@ function displayHistory(history) {
 // Quarantine Functions
 async function loadQuarantine() {
     try {
-        const quarantine = await apiCall('/api/quarantine');
-        displayQuarantine(quarantine);
+        quarantineRecords = await apiCall('/api/quarantine');
+        displayQuarantine(quarantineRecords);
     } catch (error) {
         console.error('Failed to load quarantine:', error);
         document.getElementById('quarantineTable').innerHTML = 
@@ -364,7 +553,9 @@ async function removeFromQuarantine(fileId) {
     try {
         await apiCall(`/api/quarantine/${fileId}`, { method: 'DELETE' });
         showSuccess('File removed from quarantine');
-        loadQuarantine(); // Refresh list
+        if (!streamConnected) {
+            loadQuarantine(); // Refresh list
+        }
     } catch (error) {
         showError('Failed to remove file from quarantine: ' + error.message);
     }
@@ -468,7 +659,8 @@ function showAlert(message, type) {
 
 // Cleanup on page unload
 window.addEventListener('beforeunload', function() {
-    if (metricsInterval) {
-        clearInterval(metricsInterval);
+    stopMetricsRefresh();
+    if (eventSource) {
+        eventSource.close();
     }
 });
\ No newline at end of file